@@ -1,12 +1,14 @@
 import asyncio
-import json
+import msgspec
+import orjson
+from functools import lru_cache
 import logging
 import art
 import litellm
 import wandb
 
 from textwrap import dedent
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr, ValidationError
 from dotenv import load_dotenv
 from rich import print
 from litellm import acompletion
@@ -18,11 +20,23 @@ from tools import read_repo_function, search_repo
 from data_types import Function, Scenario
 from langchain_core.utils.function_calling import convert_to_openai_function
 from litellm.caching.caching import LiteLLMCacheType, Cache
+from llm_client import close_shared_client, enable_shared_client
 from art.utils.litellm import convert_litellm_choice_to_openai
+from art.trajectories import get_messages
+from art.types import Messages
+
+try:
+    import uvloop
+except ImportError:  # uvloop does not support Windows
+    uvloop = None
 
 load_dotenv()
 
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 litellm.cache = Cache(type=LiteLLMCacheType.DISK)
+enable_shared_client()
 
 # weave.init("side-project/agent-benchmark")
 
@@ -35,120 +49,416 @@ litellm.cache = Cache(type=LiteLLMCacheType.DISK)
 
 
 class FinalAnswer(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     answer: str
     functions: list[str]
 
 
 class ProjectTrajectory(art.Trajectory):
     answer: FinalAnswer | None = None
+    _messages: list = PrivateAttr(default_factory=list)
+
+    def messages(self) -> Messages:
+        # messages_and_choices is append-only within a run, so only convert
+        # the entries added since the last call instead of the whole history.
+        converted = len(self._messages)
+        if converted < len(self.messages_and_choices):
+            self._messages.extend(
+                get_messages(self.messages_and_choices[converted:])
+            )
+        return self._messages
 
 
 MAX_TURNS = 10
+# Retries on rate limits / transient provider errors, so the scenario sweep
+# concurrency can be tuned up to the provider's rate ceiling.
+LLM_NUM_RETRIES = 3
+# Mean token logprob above which a read_function turn ends the search, when
+# run_agent is called with answer_when_confident.
+CONFIDENCE_LOGPROB_THRESHOLD = -0.2
+# Tool results are resent on every following turn, so cap their size.
+MAX_TOOL_RESULT_CHARS = 4096
 
 
-async def run_agent(model: art.Model, repo: str, question: str) -> ProjectTrajectory:
-    trajectory = ProjectTrajectory(reward=0.0, messages_and_choices=[])
+def serialize_tool_result(result: object, max_chars: int = MAX_TOOL_RESULT_CHARS) -> str:
+    """
+    Serialize a tool result to JSON for the model, truncating it structurally
+    so the JSON stays valid: search results keep the best-ranked entries and
+    a read function keeps the head of its source.
+    """
+    if isinstance(result, BaseModel):
+        return result.model_dump_json()
+    if isinstance(result, Function):
+        return serialize_function(result, max_chars)
+    if isinstance(result, list):
+        return serialize_search_results(result, max_chars)
+    return msgspec.json.encode(result).decode()
+
 
-    SYSTEM_PROMPT = dedent(
-        f"""
-        You are a github repo searcher. You will be given a question about the code within the repo.
-        You will use the tools provided to search the repo and read functions to answer the question.
-        You may operate for up to {MAX_TURNS}, so if your first search doesn't find the answer, you can use different keywords.
+def serialize_search_results(results: list, max_chars: int) -> str:
     """
+    Encode search results, dropping the lowest-ranked ones that don't fit.
+    """
+    # msgspec encodes SearchResult dataclasses natively.
+    encoded = [msgspec.json.encode(result) for result in results]
+    if sum(len(item) + 1 for item in encoded) + 1 <= max_chars:
+        return (b"[" + b",".join(encoded) + b"]").decode()
+
+    budget = max_chars - len(
+        msgspec.json.encode(
+            {"results": [], "truncated": True, "omitted_results": len(results)}
+        )
     )
+    kept = []
+    for item in encoded:
+        budget -= len(item) + 1
+        if budget < 0:
+            break
+        kept.append(msgspec.Raw(item))
+    return msgspec.json.encode(
+        {
+            "results": kept,
+            "truncated": True,
+            "omitted_results": len(results) - len(kept),
+        }
+    ).decode()
+
+
+def serialize_function(function: Function, max_chars: int) -> str:
+    """
+    Encode a read function without its code tokens, which repeat the source,
+    cutting whole_func_string to fit.
+    """
+    fields = msgspec.structs.asdict(function)
+    del fields["code_tokens"]
+    content = msgspec.json.encode(fields).decode()
+    if len(content) <= max_chars:
+        return content
+
+    source = fields["whole_func_string"]
+    fields["truncated"] = True
+
+    def encode_with_source(keep: int) -> str:
+        fields["whole_func_string"] = source[:keep]
+        return msgspec.json.encode(fields).decode()
+
+    # Escaping makes the encoded source longer than the raw one, so search for
+    # the longest prefix that fits.
+    low, high = 0, len(source)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(encode_with_source(middle)) <= max_chars:
+            low = middle
+        else:
+            high = middle - 1
+    return encode_with_source(low)
+
+
+async def discard_tool_tasks(tasks) -> None:
+    """
+    Cancel tool calls dispatched mid-stream whose results won't be used, and
+    wait for them so none is left running with an unretrieved exception.
+    """
+    tasks = list(tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Tool signatures exposed to the model, used only to build the schemas once at
+# import time. run_agent binds the callable tools to the current repo.
+def search_functions_signature(keywords: list[str]) -> list[dict]:
+    """
+    Search the repo for functions that match the keywords.
+    Return the functions in a list of dictionaries so the LLM can use them.
+    """
+    ...
+
+
+def read_function_signature(func_path: str, func_name: str) -> Function:
+    """
+    Read a function from the repo.
+    """
+    ...
+
+
+def return_answer_signature(answer: str, functions: list[str]) -> FinalAnswer:
+    """
+    Return the answer and the functions used to answer the question.
+    """
+    ...
+
+
+TOOL_SIGNATURES = {
+    "search_functions": search_functions_signature,
+    "read_function": read_function_signature,
+    "return_answer": return_answer_signature,
+}
+
+
+class UncachedResult(Exception):
+    """
+    Carries a tool result out of an lru_cache'd function without caching it.
+    """
+
+    def __init__(self, result: object):
+        super().__init__()
+        self.result = result
+
+
+# The repo tools are deterministic, so their results are memoized for the
+# lifetime of the process and shared across run_agent calls. Empty results
+# are not: the tools also return [] / None when a query fails (e.g. on lock
+# contention), and lru_cache does not cache a raised exception.
+@lru_cache(maxsize=1024)
+def memoized_search_repo(repo: str, keywords: tuple[str, ...]):
+    result = search_repo(repo, list(keywords))
+    if not result:
+        raise UncachedResult(result)
+    return result
+
+
+@lru_cache(maxsize=4096)
+def memoized_read_repo_function(repo: str, func_path: str, func_name: str):
+    result = read_repo_function(repo, func_path, func_name)
+    if result is None:
+        raise UncachedResult(result)
+    return result
+
+
+def cached_search_repo(repo: str, keywords: tuple[str, ...]):
+    try:
+        return memoized_search_repo(repo, keywords)
+    except UncachedResult as uncached:
+        return uncached.result
+
+
+def cached_read_repo_function(repo: str, func_path: str, func_name: str):
+    try:
+        return memoized_read_repo_function(repo, func_path, func_name)
+    except UncachedResult as uncached:
+        return uncached.result
+
+
+# Kept free of per-scenario data so the system prompt and tool schemas form a
+# byte-identical prefix across scenarios for provider-side prefix caching.
+SYSTEM_PROMPT = dedent(
+    f"""
+    You are a github repo searcher. You will be given a question about the code within the repo.
+    You will use the tools provided to search the repo and read functions to answer the question.
+    You may operate for up to {MAX_TURNS}, so if your first search doesn't find the answer, you can use different keywords.
+"""
+)
+
+TOOLS_SCHEMA = [
+    {"type": "function", "function": {**convert_to_openai_function(signature), "name": name}}
+    for name, signature in TOOL_SIGNATURES.items()
+]
+
+
+async def run_agent(
+    model: art.Model, repo: str, question: str, answer_when_confident: bool = False
+) -> ProjectTrajectory:
+    trajectory = ProjectTrajectory(reward=0.0, messages_and_choices=[])
+
+    # Forcing the answer from logprobs changes the actions taken outside the
+    # model's own policy, so it is never applied to a model being trained.
+    answer_when_confident = answer_when_confident and not model.trainable
 
     trajectory.messages_and_choices = [
         {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": question},
+        {"role": "user", "content": f"Repo: {repo}\nQuestion: {question}"},
     ]
 
-    def search_functions(keywords: list[str]) -> list[dict]:
-        """
-        Search the repo for functions that match the keywords.
-        Return the functions in a list of dictionaries so the LLM can use them.
-        """
-        return search_repo(repo, keywords)
+    # Keyword sets already searched in this trajectory. Repeats are answered
+    # with a hint instead of resending the same results.
+    searched_keywords: set[frozenset[str]] = set()
+
+    def search_functions(keywords: list[str]) -> list[dict] | dict:
+        key = frozenset(keyword.lower() for keyword in keywords)
+        if key in searched_keywords:
+            return {
+                "error": "duplicate search",
+                "hint": "You already searched for these keywords, try different keywords.",
+            }
+        searched_keywords.add(key)
+        return cached_search_repo(repo, tuple(keywords))
 
     def read_function(func_path: str, func_name: str) -> Function:
-        """
-        Read a function from the repo.
-        """
-        return read_repo_function(repo, func_path, func_name)
-
-    def return_answer(answer: str, functions: list[str]) -> FinalAnswer:
-        """
-        Return the answer and the functions used to answer the question.
-        """
-        return FinalAnswer(answer=answer, functions=functions)
-
-    tools = [search_functions, read_function, return_answer]
+        return cached_read_repo_function(repo, func_path, func_name)
+
+    # return_answer is not dispatched: its arguments are parsed straight into
+    # a FinalAnswer.
+    tools = [search_functions, read_function]
     tools_by_name = {tool.__name__: tool for tool in tools}
-    trajectory.tools = [
-        {"type": "function", "function": convert_to_openai_function(search_functions)},
-        {"type": "function", "function": convert_to_openai_function(read_function)},
-        {"type": "function", "function": convert_to_openai_function(return_answer)},
-    ]
+    trajectory.tools = TOOLS_SCHEMA
 
     if model.trainable:
         litellm_model_name = f"hosted_vllm/{model.name}"
     else:
         litellm_model_name = model.name
 
+    async def run_tool_call(tool_name: str, arguments: str) -> object:
+        tool_args = orjson.loads(arguments)
+        tool_to_call = tools_by_name[tool_name]
+        # The repo tools are synchronous SQLite lookups; run them in a
+        # worker thread so parallel tool calls overlap.
+        tool_result = await asyncio.to_thread(tool_to_call, **tool_args)
+        logging.info("Tool %s called with args %s", tool_name, tool_args)
+        logging.info("Tool result: %s", tool_result)
+        return tool_result
+
     turns = 0
-    logging.info(f"Running agent with input: {question}")
+    force_answer = False
+    logging.info("Running agent with input: %s", question)
     while turns < MAX_TURNS:
-        logging.info(f"Turn {turns + 1}:")
-        response = await acompletion(
+        logging.info("Turn %d:", turns + 1)
+        messages = trajectory.messages()
+        # Force the answer on the last turn rather than spending it on a
+        # search whose result could never be used, or (if enabled) once the
+        # model is confidently reading functions it has already found. Like
+        # the confidence heuristic, this overrides the policy's own choice,
+        # so a model being trained always picks its tools itself.
+        if force_answer or (turns == MAX_TURNS - 1 and not model.trainable):
+            tool_choice = {"type": "function", "function": {"name": "return_answer"}}
+        else:
+            tool_choice = "auto"
+        stream = await acompletion(
             model=litellm_model_name,
             base_url=model.inference_base_url,
             api_key=model.inference_api_key,
             temperature=1,
-            messages=trajectory.messages(),
+            messages=messages,
             tools=trajectory.tools,
+            tool_choice=tool_choice,
             caching=False,
+            stream=True,
+            logprobs=True if answer_when_confident else None,
+            num_retries=LLM_NUM_RETRIES,
         )
 
-        response_message = response.choices[0].message
-        if response.choices[0] is None:
-            logging.error(f"Response message is None for turn {turns}")
+        # Accumulate streamed tool call deltas by index and dispatch each tool
+        # as soon as its arguments form valid JSON, so tool execution overlaps
+        # with the rest of the generation.
+        chunks = []
+        token_logprobs: list[float] = []
+        partial_tool_calls: dict[int, dict] = {}
+        pending_tasks: dict[int, asyncio.Task] = {}
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                if not chunk.choices:
+                    continue
+                chunk_logprobs = getattr(chunk.choices[0], "logprobs", None)
+                if chunk_logprobs and chunk_logprobs.content:
+                    token_logprobs.extend(token.logprob for token in chunk_logprobs.content)
+                for delta in chunk.choices[0].delta.tool_calls or []:
+                    partial = partial_tool_calls.setdefault(
+                        delta.index, {"name": "", "arguments": ""}
+                    )
+                    if delta.function.name:
+                        partial["name"] += delta.function.name
+                    if delta.function.arguments:
+                        partial["arguments"] += delta.function.arguments
+
+                    if (
+                        delta.index in pending_tasks
+                        or partial["name"] not in tools_by_name
+                    ):
+                        continue
+                    try:
+                        orjson.loads(partial["arguments"])
+                    except orjson.JSONDecodeError:
+                        continue
+                    pending_tasks[delta.index] = asyncio.create_task(
+                        run_tool_call(partial["name"], partial["arguments"])
+                    )
+        except BaseException:
+            await discard_tool_tasks(pending_tasks.values())
+            raise
+
+        response = litellm.stream_chunk_builder(chunks, messages=messages)
+        if response is None or not response.choices:
+            logging.error("Response message is None for turn %d", turns)
+            await discard_tool_tasks(pending_tasks.values())
+            return trajectory
 
+        response_message = response.choices[0].message
         trajectory.messages_and_choices.append(
             convert_litellm_choice_to_openai(response.choices[0])
         )
 
         # Terminate early. We always want tool calls. This indicates an issue.
         if response_message.tool_calls is None:
-            logging.error(f"Response message has no tool calls for turn {turns}")
+            logging.error("Response message has no tool calls for turn %d", turns)
+            await discard_tool_tasks(pending_tasks.values())
             return trajectory
 
-        try:
-            for tool_call in response.choices[0].message.tool_calls:
-                tool_name: str = tool_call.function.name  # type: ignore
-                if tool_name in tools_by_name:
-                    tool_args = json.loads(tool_call.function.arguments)
-                    tool_to_call = tools_by_name[tool_name]
-                    tool_result = tool_to_call(**tool_args)
-                    logging.info(f"Tool {tool_name} called with args {tool_args}")
-                    logging.info(f"Tool result: {tool_result}")
-                    trajectory.messages_and_choices.append(
-                        {
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "name": tool_name,
-                            "content": (
-                                "" if tool_result is None else str(tool_result)
-                            ),
-                        }
-                    )
-
-                    if tool_name == "return_answer":
-                        trajectory.answer = tool_result
-                        logging.info(f"Returning answer: {tool_result}")
-                        return trajectory
+        tool_calls = response_message.tool_calls
+        coros = []
+        for index, tool_call in enumerate(tool_calls):
+            if index in pending_tasks:
+                coros.append(pending_tasks[index])
+            elif tool_call.function.name in tools_by_name:
+                coros.append(
+                    run_tool_call(tool_call.function.name, tool_call.function.arguments)
+                )
+            else:
+                coros.append(asyncio.sleep(0, result=None))
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        # Tasks dispatched for calls missing from the final message
+        await discard_tool_tasks(
+            task for index, task in pending_tasks.items() if index >= len(tool_calls)
+        )
 
-        except Exception as e:
-            logging.error(f"Error in tool call: {e}")
-            return trajectory
+        for tool_call, result in zip(tool_calls, results):
+            tool_name: str = tool_call.function.name  # type: ignore
+            if tool_name == "return_answer":
+                try:
+                    answer = FinalAnswer.model_validate_json(
+                        tool_call.function.arguments
+                    )
+                except ValidationError as e:
+                    logging.error("Error in tool call: %s", e)
+                    return trajectory
+                trajectory.messages_and_choices.append(
+                    {
+                        "role": "tool",
+                        "tool_call_id": tool_call.id,
+                        "name": tool_name,
+                        "content": answer.model_dump_json(),
+                    }
+                )
+                trajectory.answer = answer
+                logging.info("Returning answer: %s", answer)
+                return trajectory
+            if tool_name not in tools_by_name:
+                continue
+            if isinstance(result, Exception):
+                logging.error("Error in tool call: %s", result)
+                return trajectory
+
+            trajectory.messages_and_choices.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "name": tool_name,
+                    "content": (
+                        ""
+                        if result is None
+                        else serialize_tool_result(result)
+                    ),
+                }
+            )
+
+        # A confident turn that reads functions (rather than searching) means
+        # the model is gathering its answer; have it answer on the next turn.
+        if answer_when_confident and token_logprobs:
+            mean_logprob = sum(token_logprobs) / len(token_logprobs)
+            force_answer = mean_logprob > CONFIDENCE_LOGPROB_THRESHOLD and any(
+                tool_call.function.name == "read_function" for tool_call in tool_calls
+            )
 
         turns += 1
 
@@ -162,7 +472,7 @@ async def run_agent_and_score(
     trajectory = await run_agent(model, scenario.repo, scenario.question)
     if trajectory.answer is None:
         logging.warning(
-            f"Agent could not find an answer for scenario {scenario.question}"
+            "Agent could not find an answer for scenario %s", scenario.question
         )
         return trajectory
 
@@ -172,6 +482,27 @@ async def run_agent_and_score(
     return trajectory
 
 
+async def main(
+    model: art.Model, scenarios: list[Scenario], concurrency: int = 16
+) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(step: int, scenario: Scenario) -> float:
+        async with semaphore:
+            trajectory = await run_agent_and_score(model, scenario)
+        print("--------------------------------")
+        print(f"Step {step}: {scenario.question}")
+        print(f"Score: {trajectory.reward}")
+        return trajectory.reward
+
+    try:
+        return await asyncio.gather(
+            *[run_one(step, scenario) for step, scenario in enumerate(scenarios)]
+        )
+    finally:
+        await close_shared_client()
+
+
 if __name__ == "__main__":
     model_name = "openrouter/qwen/qwen3-32b"
 
@@ -179,16 +510,6 @@ if __name__ == "__main__":
         "JamesSED/synthetic_QA_code_search_net", split="train", limit=1000, shuffle=False
     )
     model = art.Model(name=model_name, project="rl-agent")
-    step = 0
-    scores = []
-    for scenario in scenarios:
-        print("--------------------------------")
-        print(f"Step {step}: {scenario.question}")
-        score = asyncio.run(run_agent_and_score(model, scenario))
-        print(f"Score: {score.reward}")
-        scores.append(score.reward)
-        if step == 50:
-            break
-        step += 1
+    scores = asyncio.run(main(model, scenarios[:51]))
 
     print(f"Average score: {sum(scores)/len(scores)}")
@@ -1,78 +1,192 @@
 import asyncio
-import json
+import orjson
+import os
+import sqlite3
+from itertools import islice
 from pathlib import Path
 
-from agent import run_agent
-from judge import judge_answer, JudgeAnswer
-from rich import print
+import art
+from agent import FinalAnswer, run_agent
+from judge import judge_answers_batch, JudgeAnswer
+from llm_client import close_shared_client
+from rich.console import Console
 
-def load_data(file_path: str):
-    """Load synthetic data from JSONL file."""
-    data = []
-    with open(file_path, 'r') as f:
+MODEL_NAME = "openrouter/qwen/qwen3-32b"
+AGENT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "agent_cache.db")
+
+# One console for the whole run. Highlighting and markup are off so long
+# LLM outputs are written without per-string regex passes (and brackets in
+# answers are not parsed as markup).
+console = Console(highlight=False, markup=False)
+
+def open_agent_cache(db_path: str = AGENT_CACHE_PATH) -> sqlite3.Connection | None:
+    """
+    Open the cache of agent answers keyed by (model, repo, question), so reruns
+    skip the agent loop for unchanged items. Only enabled with AGENT_CACHE=on:
+    the key ignores the agent prompt, tools and code, so after changing them
+    the cached answers are stale (delete data/agent_cache.db).
+    """
+    if os.getenv("AGENT_CACHE") != "on":
+        return None
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agent_cache (
+            model TEXT NOT NULL,
+            repo TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL, -- FinalAnswer as JSON
+            PRIMARY KEY (model, repo, question)
+        )
+    """)
+    return conn
+
+def get_cached_agent_answer(conn: sqlite3.Connection, repo: str, question: str) -> FinalAnswer | None:
+    row = conn.execute(
+        "SELECT answer FROM agent_cache WHERE model = ? AND repo = ? AND question = ?",
+        (MODEL_NAME, repo, question),
+    ).fetchone()
+    return None if row is None else FinalAnswer.model_validate_json(row[0])
+
+def cache_agent_answer(conn: sqlite3.Connection, repo: str, question: str, answer: FinalAnswer):
+    # Only answered runs are cached, so failed runs are retried next time
+    conn.execute(
+        "INSERT OR REPLACE INTO agent_cache (model, repo, question, answer) VALUES (?, ?, ?, ?)",
+        (MODEL_NAME, repo, question, answer.model_dump_json()),
+    )
+    conn.commit()
+
+def iter_data(file_path: str):
+    """Lazily yield synthetic data rows from JSONL file."""
+    with open(file_path, 'rb') as f:
         for line in f:
             if line.strip():
-                data.append(json.loads(line))
-    return data
+                yield orjson.loads(line)
 
-async def test_flow(data_file: str, max_items: int = 40):
+def load_data(file_path: str, limit: int | None = None):
+    """Load synthetic data from JSONL file, stopping after limit rows."""
+    return list(islice(iter_data(file_path), limit))
+
+async def test_flow(
+    data_file: str,
+    max_items: int = 40,
+    agent_concurrency: int = 10,
+    judge_concurrency: int = 2,
+    judge_batch_size: int = 8,
+):
     """Test the flow: load data -> run agent -> judge result."""
     
     # Load data
-    data = load_data(data_file)
-    print(f"Loaded {len(data)} items")
-    
-    # Track correct answers
-    correct_answers = 0
-    total_questions = 0
-    
-    # Test on first few items
-    for i, item in enumerate(data[:max_items]):
-        print(f"\n--- Item {i+1} ---")
-        print(f"Question: {item['question']}")
-        print(f"Repo: {item['repo']}")
-        print(f"Answer: {item['answer']}")
-        print(f"Functions: {item['functions']} \n")
-        
-        total_questions += 1
-        
-        # Run agent
-        try:
-            agent_result = await run_agent(item['repo'], item['question'])
-            print(f"Agent Result: {agent_result}")
-            if agent_result:                
-                # Judge the result
-                judge_result = await judge_answer(
-                    question=item['question'],
-                    ref_answer=item['answer'], 
-                    ref_functions=item['functions'],
-                    answer=(
-                        f"{agent_result.structured_answer.explanation} \n"
-                        f"{agent_result.structured_answer.code_snippet} \n"
-                        f"{agent_result.structured_answer.code_explanation} \n"
-                    )
-                )
-                print(f"Judge Result: {judge_result}")
-                
-                if judge_result.is_correct:
-                    correct_answers += 1
-                    
+    data = load_data(data_file, limit=max_items)
+    console.print(f"Loaded {len(data)} items")
+
+    model = art.Model(name=MODEL_NAME, project="rl-agent")
+    agent_cache = open_agent_cache()
+
+    # Test on first few items. Agents and judges run as two worker pools
+    # joined by a queue, so judging one item overlaps with running the
+    # agent on the next.
+    item_queue: asyncio.Queue = asyncio.Queue()
+    for i, item in enumerate(data):
+        item_queue.put_nowait((i, item))
+    judge_queue: asyncio.Queue = asyncio.Queue()
+    results: list[JudgeAnswer] = [None] * len(data)  # type: ignore
+
+    def finish_item(i: int, lines: list[str], judge_result: JudgeAnswer):
+        # Output is buffered per item so concurrently running items don't interleave
+        console.print("\n".join(lines))
+        results[i] = judge_result
+
+    async def agent_worker():
+        while True:
+            try:
+                i, item = item_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            lines = [
+                f"\n--- Item {i+1} ---",
+                f"Question: {item['question']}",
+                f"Repo: {item['repo']}",
+                f"Answer: {item['answer']}",
+                f"Functions: {item['functions']} \n",
+            ]
+            answer = None
+            if agent_cache is not None:
+                answer = get_cached_agent_answer(agent_cache, item['repo'], item['question'])
+            if answer is None:
+                try:
+                    agent_result = await run_agent(model, item['repo'], item['question'])
+                except Exception as e:
+                    lines.append(f"Error: {e}")
+                    finish_item(i, lines, JudgeAnswer(reasoning=f"Error: {e}", is_correct=False))
+                    continue
+                # Printing the full trajectory with rich walks every message;
+                # only do it when explicitly debugging.
+                if os.getenv("AGENT_DEBUG"):
+                    lines.append(f"Agent Result: {agent_result}")
+                answer = agent_result.answer
+                if answer and agent_cache is not None:
+                    cache_agent_answer(agent_cache, item['repo'], item['question'], answer)
+            if answer:
+                await judge_queue.put((i, item, answer, lines))
             else:
-                judge_result = JudgeAnswer(reasoning="Agent returned None", is_correct=False)
-                print("Agent returned None")
-                
-        except Exception as e:
-            print(f"Error: {e}")
+                lines.append("Agent returned None")
+                finish_item(i, lines, JudgeAnswer(reasoning="Agent returned None", is_correct=False))
+
+    async def judge_worker():
+        while True:
+            entry = await judge_queue.get()
+            if entry is None:
+                return
+            # Judge whatever else has queued up in the same batch
+            entries = [entry]
+            while len(entries) < judge_batch_size and not judge_queue.empty():
+                entry = judge_queue.get_nowait()
+                if entry is None:
+                    # Leave the shutdown sentinel for the next get
+                    judge_queue.put_nowait(None)
+                    break
+                entries.append(entry)
+            try:
+                judge_results = await judge_answers_batch(
+                    [(item['question'], item['answer'], answer) for _, item, answer, _ in entries]
+                )
+            except Exception as e:
+                judge_results = [JudgeAnswer(reasoning=f"Error: {e}", is_correct=False)] * len(entries)
+            for (i, _, _, lines), judge_result in zip(entries, judge_results):
+                lines.append(f"Judge Result: {judge_result}")
+                finish_item(i, lines, judge_result)
+
+    judge_workers = [asyncio.create_task(judge_worker()) for _ in range(judge_concurrency)]
+    agent_workers = [asyncio.create_task(agent_worker()) for _ in range(agent_concurrency)]
+    try:
+        await asyncio.gather(*agent_workers)
+        for _ in judge_workers:
+            await judge_queue.put(None)
+        await asyncio.gather(*judge_workers)
+    finally:
+        # If a worker raised, the others (and the judges, which would wait
+        # for their sentinels forever) are still running; stop them.
+        for task in agent_workers + judge_workers:
+            task.cancel()
+        await asyncio.gather(*agent_workers, *judge_workers, return_exceptions=True)
+        await close_shared_client()
+        if agent_cache is not None:
+            agent_cache.close()
+
+    # Track correct answers
+    total_questions = len(results)
+    correct_answers = sum(result.is_correct for result in results)
     
     # Calculate and display probability
     if total_questions > 0:
         probability = correct_answers / total_questions
-        print(f"\n--- Results ---")
-        print(f"Correct answers: {correct_answers}")
-        print(f"Total questions: {total_questions}")
-        print(f"Probability of correct answer: {probability:.3f} ({probability * 100:.1f}%)")
+        console.print(f"\n--- Results ---")
+        console.print(f"Correct answers: {correct_answers}")
+        console.print(f"Total questions: {total_questions}")
+        console.print(f"Probability of correct answer: {probability:.3f} ({probability * 100:.1f}%)")
     else:
-        print("No questions processed")
+        console.print("No questions processed")
 
 if __name__ == "__main__":
     # Test with train data
@@ -80,4 +194,4 @@ if __name__ == "__main__":
     if Path(train_file).exists():
         asyncio.run(test_flow(train_file, max_items=20))
     else:
-        print(f"File {train_file} doesn't exist")
+        console.print(f"File {train_file} doesn't exist")
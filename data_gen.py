@@ -1,22 +1,20 @@
 import logging
 import sqlite3
-import json
+import orjson
 from dataclasses import dataclass
 from textwrap import dedent
 import time
 from typing import Iterator, List, Dict, Any, Literal
 from pathlib import Path
 
-from diskcache import Cache
-import litellm
 from litellm import acompletion
-from litellm.caching.caching import LiteLLMCacheType, Cache
-from local_db import DB_PATH
+from llm_cache import enable_litellm_cache
+from local_db import DB_PATH, repo_counts_source
 from pydantic import BaseModel, Field
 from rich import print
 from tqdm import tqdm
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FunctionSnippet():
     name: str
     documentation_string: str
@@ -108,7 +106,7 @@ def iterate_repo_functions(
 
 
 
-litellm.cache = Cache(type=LiteLLMCacheType.DISK)
+enable_litellm_cache()
 
 
 class GeneratedSyntheticQuery(BaseModel):
@@ -198,12 +196,13 @@ def filter_repos(db_path: str, split_type: Literal["train", "test"], min_func_co
     elif split_type == "test":
         split_filter = "WHERE split_name IN ('test', 'valid')"
     
+    # repo_counts holds per-(repository, split) counts built with the database
     cursor.execute(f"""
         SELECT repository_name
-        FROM github_code
+        FROM {repo_counts_source(conn)}
         {split_filter}
         GROUP BY repository_name
-        HAVING COUNT(*) >= ?
+        HAVING SUM(function_count) >= ?
     """, (min_func_count,))
     
     repos = [row[0] for row in cursor.fetchall()]
@@ -281,7 +280,7 @@ async def generate_and_write_synthetic_data(
             
             output_file = output_path / f"{split_type}.jsonl"
             
-            with open(output_file, 'a', encoding='utf-8') as f:
+            with open(output_file, 'ab', buffering=1 << 20) as f:
                 for qa_pair in qa_pairs:
                     # Create JSONL entry with split information
                     jsonl_entry = {
@@ -292,7 +291,8 @@ async def generate_and_write_synthetic_data(
                         "how_realistic": qa_pair.how_realistic,
                         "split": split_type
                     }
-                    f.write(json.dumps(jsonl_entry) + '\n')
+                    f.write(orjson.dumps(jsonl_entry))
+                    f.write(b'\n')
             
             repo_progress.write(f"Wrote {len(qa_pairs)} QA pairs to {output_file}")
             
@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+import msgspec
+from pydantic import BaseModel, ConfigDict
 from typing import List, Literal 
 
-class Function(BaseModel):
+class Function(msgspec.Struct):
     repo_name: str  # NOT NULL
     func_path_in_repository: str  # NOT NULL
     func_name: str  # NOT NULL
@@ -11,6 +12,8 @@ class Function(BaseModel):
     code_tokens: str  # NOT NULL
 
 class Scenario(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     question: str
     answer: str
     repo: str
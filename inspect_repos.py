@@ -1,9 +1,18 @@
 import sqlite3
 import os
-from local_db import DB_PATH
+from local_db import DB_PATH, repo_counts_source
 from rich import print
 
-def print_repos_with_over_n_functions(min_functions: int = 500, db_path: str = DB_PATH):
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """
+    Open a connection for inspection queries, memory-mapping the database file
+    so large GROUP BY scans avoid read syscalls.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA mmap_size = 268435456;")
+    return conn
+
+def print_repos_with_over_n_functions(min_functions: int = 500, db_path: str = DB_PATH, conn: sqlite3.Connection | None = None):
     """
     Print repositories that have over the specified number of functions stored in the database.
     Shows repository name and function count, ordered by count (highest first).
@@ -11,37 +20,40 @@ def print_repos_with_over_n_functions(min_functions: int = 500, db_path: str = D
     Args:
         min_functions: Minimum number of functions required (default: 500)
         db_path: Path to the SQLite database
+        conn: Open connection to reuse; if None, one is opened on db_path and closed afterwards
     """
-    if not os.path.exists(db_path):
-        print(f"Database not found at: {db_path}")
-        return
+    owns_conn = conn is None
+    if owns_conn:
+        if not os.path.exists(db_path):
+            print(f"Database not found at: {db_path}")
+            return
+        conn = connect(db_path)
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    query = """
-        SELECT repository_name, COUNT(*) as function_count
-        FROM github_code
+    query = f"""
+        SELECT repository_name, SUM(function_count) as total_count
+        FROM {repo_counts_source(conn)}
         GROUP BY repository_name
-        HAVING COUNT(*) > ?
-        ORDER BY function_count DESC
+        HAVING SUM(function_count) > ?
+        ORDER BY total_count DESC
     """
     
-    cursor.execute(query, (min_functions,))
-    results = cursor.fetchall()
-    conn.close()
+    results = conn.execute(query, (min_functions,)).fetchall()
+    if owns_conn:
+        conn.close()
     
     if not results:
         print(f"No repositories found with over {min_functions} functions.")
         return
     
-    print(f"Found {len(results)} repositories with over {min_functions} functions:")
-    print("-" * 60)
-    for repo_name, count in results:
-        print(f"{repo_name:<50} {count:>8} functions")
+    lines = [
+        f"Found {len(results)} repositories with over {min_functions} functions:",
+        "-" * 60,
+    ]
+    lines.extend(f"{repo_name:<50} {count:>8} functions" for repo_name, count in results)
+    print("\n".join(lines))
 
 
-def get_functions_by_path(repo_name: str, min_functions_per_path: int = 2, db_path: str = DB_PATH) -> dict[str, int]:
+def get_functions_by_path(repo_name: str, min_functions_per_path: int = 2, db_path: str = DB_PATH, conn: sqlite3.Connection | None = None) -> dict[str, int]:
     """
     Group functions by their path within a repository.
     Returns a dictionary mapping file paths to their function counts.
@@ -51,16 +63,17 @@ def get_functions_by_path(repo_name: str, min_functions_per_path: int = 2, db_pa
         repo_name: Name of the repository to analyze
         min_functions_per_path: Minimum number of functions required in a path to include it
         db_path: Path to the SQLite database
+        conn: Open connection to reuse; if None, one is opened on db_path and closed afterwards
         
     Returns:
         Dict mapping file paths to their function counts
     """
-    if not os.path.exists(db_path):
-        print(f"Database not found at: {db_path}")
-        return {}
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    owns_conn = conn is None
+    if owns_conn:
+        if not os.path.exists(db_path):
+            print(f"Database not found at: {db_path}")
+            return {}
+        conn = connect(db_path)
     
     # Get paths and their function counts
     query = """
@@ -72,19 +85,20 @@ def get_functions_by_path(repo_name: str, min_functions_per_path: int = 2, db_pa
         ORDER BY func_count DESC
     """
     
-    cursor.execute(query, (repo_name, min_functions_per_path))
-    results = cursor.fetchall()
-    conn.close()
+    results = conn.execute(query, (repo_name, min_functions_per_path)).fetchall()
+    if owns_conn:
+        conn.close()
     
     # Build the return dictionary
-    path_to_count: dict[str, int] = {}
-    for path, count in results:
-        path_to_count[path] = count
-        
-    return path_to_count
+    return dict(results)
 
 
 if __name__ == "__main__":
-    print_repos_with_over_n_functions()
-    # Example usage of new functions:
-    print(get_functions_by_path("brocade/pynos", min_functions_per_path=3))
\ No newline at end of file
+    if not os.path.exists(DB_PATH):
+        print(f"Database not found at: {DB_PATH}")
+    else:
+        conn = connect(DB_PATH)
+        print_repos_with_over_n_functions(conn=conn)
+        # Example usage of new functions:
+        print(get_functions_by_path("brocade/pynos", min_functions_per_path=3, conn=conn))
+        conn.close()
\ No newline at end of file
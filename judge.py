@@ -1,48 +1,125 @@
+import asyncio
+import hashlib
 import logging
+import os
+import sqlite3
 from textwrap import dedent
 from litellm import acompletion
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 import dotenv
+from llm_client import enable_shared_client
 from rich import print
 
 dotenv.load_dotenv()
 
+enable_shared_client()
+
+JUDGE_MODEL = "gpt-4.1"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JUDGE_CACHE_PATH = os.path.join(BASE_DIR, "data", "judge_cache.db")
+
+SYSTEM_PROMPT = dedent(
+    """
+    You will be given a question and two different answers to the question, the correct answer and the answer given by an AI. 
+
+    Your job is to determine if the answer given by the AI is correct. 
+
+    You return True the if the AI answer contains the relevant information from the correct answer. You should return False if the AI answer is missing information relevant to the question, or if it contradicts the correct answer.
+
+    --------------------------------------------------------------------------------
+    JSON response format (no additional keys):
+    {
+      "reasoning": "<concise explanation of your judgement>",
+      "is_correct": <true | false>
+    }
+    """
+)
+
+judge_cache_conn = None
+judge_inflight: dict[str, asyncio.Future] = {}
+
+
 class JudgeAnswer(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     reasoning: str = Field(description="Reasoning why answer is correct")
     is_correct: bool = Field(description="Whether the answer is correct")
 
-async def judge_answer(question: str, ref_answer: str, answer: str) -> JudgeAnswer:
-    SYSTEM_PROMPT = dedent(
-        """
-        You will be given a question and two different answers to the question, the correct answer and the answer given by an AI. 
-        
-        Your job is to determine if the answer given by the AI is correct. 
 
-        You return True the if the AI answer contains the relevant information from the correct answer. You should return False if the AI answer is missing information relevant to the question, or if it contradicts the correct answer.
-        
-        --------------------------------------------------------------------------------
-        JSON response format (no additional keys):
-        {
-          "reasoning": "<concise explanation of your judgement>",
-          "is_correct": <true | false>
-        }
-        """
+def get_judge_cache_conn():
+    global judge_cache_conn
+    if judge_cache_conn is None:
+        os.makedirs(os.path.dirname(JUDGE_CACHE_PATH), exist_ok=True)
+        judge_cache_conn = sqlite3.connect(JUDGE_CACHE_PATH, check_same_thread=False)
+        judge_cache_conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS judge_cache (
+                key TEXT PRIMARY KEY,
+                reasoning TEXT NOT NULL,
+                is_correct INTEGER NOT NULL
+            )
+            """
+        )
+    return judge_cache_conn
+
+
+def judge_cache_key(question: str, ref_answer: str, answer: str) -> str:
+    return hashlib.sha256(
+        f"{JUDGE_MODEL}|{question}|{ref_answer}|{answer}".encode()
+    ).hexdigest()
+
+
+def get_cached_judgement(key: str) -> JudgeAnswer | None:
+    row = get_judge_cache_conn().execute(
+        "SELECT reasoning, is_correct FROM judge_cache WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        return None
+    return JudgeAnswer(reasoning=row[0], is_correct=bool(row[1]))
+
+
+def cache_judgement(key: str, judgement: JudgeAnswer) -> None:
+    conn = get_judge_cache_conn()
+    conn.execute(
+        "INSERT OR REPLACE INTO judge_cache (key, reasoning, is_correct) VALUES (?, ?, ?)",
+        (key, judgement.reasoning, int(judgement.is_correct)),
     )
+    conn.commit()
+
+
+async def judge_answer(question: str, ref_answer: str, answer: str) -> JudgeAnswer:
+    # Judgements are deterministic enough to reuse across benchmark reruns,
+    # so they are cached by exact (question, reference, answer) match.
+    cache_key = judge_cache_key(question, ref_answer, str(answer))
+    cached = get_cached_judgement(cache_key)
+    if cached is not None:
+        return cached
+
+    # Coalesce concurrent duplicate calls onto a single in-flight request.
+    task = judge_inflight.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(
+            request_judgement(cache_key, question, ref_answer, answer)
+        )
+        judge_inflight[cache_key] = task
+        task.add_done_callback(lambda _: judge_inflight.pop(cache_key, None))
+    return await asyncio.shield(task)
 
+
+async def request_judgement(
+    cache_key: str, question: str, ref_answer: str, answer: str
+) -> JudgeAnswer:
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": 
-            f"Question: {question} \n"  
-            f"Correct answer: {ref_answer} \n"
-            f"AI answer: {answer}"
-        }
+        {"role": "user", "content": f"Question: {question} \nCorrect answer: {ref_answer} \nAI answer: {answer}"},
     ]
     
     try:
         resp = await acompletion(
-            model="gpt-4.1",
+            model=JUDGE_MODEL,
             messages=messages,
-            caching=True,
+            caching=False,
         )
     except Exception as e:
         logging.error(f"Error in acompletion call: {e}")
@@ -52,23 +129,31 @@ async def judge_answer(question: str, ref_answer: str, answer: str) -> JudgeAnsw
     try:
         content = resp["choices"][0]["message"]["content"]  # type: ignore
         
-        # Try to parse JSON from the content
-        import json
-        json_data = json.loads(content)
-        
-        judge_answer = JudgeAnswer(
-            reasoning=json_data.get("reasoning", "No reasoning provided"),
-            is_correct=json_data.get("is_correct", False)
-        )
+        # Parse and validate the JSON content in one pass
+        judge_answer = JudgeAnswer.model_validate_json(content)
         
     except Exception as e:
         logging.error(f"Error parsing response: {e}")
         logging.error(f"Content: {content if 'content' in locals() else 'No content'}")
         return JudgeAnswer(reasoning="Error parsing response", is_correct=False)
-    
+
+    cache_judgement(cache_key, judge_answer)
     return judge_answer
     
+async def judge_answers_batch(items: list[tuple[str, str, str]]) -> list[JudgeAnswer]:
+    """
+    Judge a batch of (question, ref_answer, answer) triples concurrently.
+
+    Requests share the LiteLLM client's connection pool, and duplicate
+    triples within the batch resolve to a single request.
+    """
+    return await asyncio.gather(
+        *[
+            judge_answer(question, ref_answer, answer)
+            for question, ref_answer, answer in items
+        ]
+    )
+
 if __name__ == "__main__":
-    import asyncio
     res = asyncio.run(judge_answer("What is the capital of France?", "Paris", "Paris"))
     print(res)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import litellm
+from litellm.caching.caching import LiteLLMCacheType, Cache
+
+
+class TieredDiskCache:
+    """
+    In-process LRU tier in front of LiteLLM's disk cache.
+
+    Hits on hot prompts are served from memory, skipping the disk read and
+    JSON decode. Misses fall through to the disk cache and are promoted with
+    the expiry the disk cache holds for them, so the memory tier never
+    outlives a ttl.
+    """
+
+    def __init__(self, disk_cache, maxsize: int = 4096):
+        self.disk_cache = disk_cache
+        self.maxsize = maxsize
+        self._memory: OrderedDict[str, tuple[Any, Optional[float]]] = OrderedDict()
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return None if ttl is None else time.time() + float(ttl)
+
+    def _disk_expiry(self, key: str) -> Optional[float]:
+        # diskcache records absolute wall-clock expiry times alongside entries.
+        _, expire_time = self.disk_cache.disk_cache.get(key, expire_time=True)
+        return expire_time
+
+    def _remember(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _recall(self, key: str) -> Any:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _promote(self, key: str, value: Any) -> None:
+        if value is not None:
+            self._remember(key, value, self._disk_expiry(key))
+
+    def get_cache(self, key: str, **kwargs) -> Any:
+        value = self._recall(key)
+        if value is None:
+            value = self.disk_cache.get_cache(key, **kwargs)
+            self._promote(key, value)
+        return value
+
+    async def async_get_cache(self, key: str, **kwargs) -> Any:
+        value = self._recall(key)
+        if value is None:
+            value = await self.disk_cache.async_get_cache(key, **kwargs)
+            self._promote(key, value)
+        return value
+
+    def batch_get_cache(self, keys: list, **kwargs) -> list:
+        return [self.get_cache(key, **kwargs) for key in keys]
+
+    async def async_batch_get_cache(self, keys: list, **kwargs) -> list:
+        return [await self.async_get_cache(key, **kwargs) for key in keys]
+
+    def set_cache(self, key: str, value: Any, **kwargs) -> None:
+        self._remember(key, value, self._expiry(kwargs.get("ttl")))
+        self.disk_cache.set_cache(key, value, **kwargs)
+
+    async def async_set_cache(self, key: str, value: Any, **kwargs) -> None:
+        self._remember(key, value, self._expiry(kwargs.get("ttl")))
+        await self.disk_cache.async_set_cache(key, value, **kwargs)
+
+    async def async_set_cache_pipeline(self, cache_list: list, **kwargs) -> None:
+        expires_at = self._expiry(kwargs.get("ttl"))
+        for key, value in cache_list:
+            self._remember(key, value, expires_at)
+        await self.disk_cache.async_set_cache_pipeline(cache_list, **kwargs)
+
+    def increment_cache(self, key: str, value: int, **kwargs) -> int:
+        self._memory.pop(key, None)
+        return self.disk_cache.increment_cache(key, value, **kwargs)
+
+    async def async_increment(self, key: str, value: float, **kwargs) -> float:
+        self._memory.pop(key, None)
+        return await self.disk_cache.async_increment(key, value, **kwargs)
+
+    def delete_cache(self, key: str) -> None:
+        self._memory.pop(key, None)
+        self.disk_cache.delete_cache(key)
+
+    def flush_cache(self) -> None:
+        self._memory.clear()
+        self.disk_cache.flush_cache()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.disk_cache, name)
+
+
+def enable_litellm_cache(maxsize: int = 4096) -> Cache:
+    """
+    Configure LiteLLM to use the disk cache with an in-memory LRU in front.
+
+    Only worth enabling where completions are issued with caching=True
+    (data_gen); the agent and judge bypass the cache.
+    """
+    cache = Cache(type=LiteLLMCacheType.DISK)
+    cache.cache = TieredDiskCache(cache.cache, maxsize=maxsize)
+    litellm.cache = cache
+    return cache
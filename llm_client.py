@@ -0,0 +1,35 @@
+import httpx
+import litellm
+
+shared_client: httpx.AsyncClient | None = None
+
+
+def enable_shared_client() -> httpx.AsyncClient:
+    """
+    Route every LiteLLM async call through one long-lived, pooled HTTP client,
+    so provider connections (and their TLS handshakes) are reused across
+    agent turns, scenarios and judge calls. Safe to call more than once.
+    """
+    global shared_client
+    if shared_client is None:
+        shared_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=100, max_keepalive_connections=50, keepalive_expiry=60
+            ),
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+        litellm.aclient_session = shared_client
+    return shared_client
+
+
+async def close_shared_client() -> None:
+    """
+    Close the shared client. Await it at the end of the asyncio.run that used
+    the client: its pooled connections belong to that event loop and can't be
+    closed once the loop is gone.
+    """
+    global shared_client
+    if shared_client is not None:
+        await shared_client.aclose()
+        shared_client = None
+        litellm.aclient_session = None
@@ -1,19 +1,37 @@
 from typing import List, Literal
 from data_types import Scenario
 from datasets import load_dataset, Dataset
+from pydantic import TypeAdapter
 from rich import print
 
 import dotenv
 
 dotenv.load_dotenv()
 
+# Validates a whole batch of rows in one pydantic-core call.
+SCENARIOS_ADAPTER = TypeAdapter(List[Scenario])
+
 
 def download_dataset(
-    name: str, split: Literal["train", "test"], limit: int = 1000, shuffle: bool = False
+    name: str,
+    split: Literal["train", "test"],
+    limit: int = 1000,
+    shuffle: bool = False,
+    how_realistic_threshold: float | None = None,
 ) -> Dataset:
     ds = load_dataset(name, split=split)
+    # Filter on the Arrow-backed dataset before limiting, so the limit counts
+    # realistic rows and filtered-out rows never become Python objects.
+    if how_realistic_threshold is not None:
+        ds = ds.filter(
+            lambda batch: [
+                value >= how_realistic_threshold for value in batch["how_realistic"]
+            ],
+            batched=True,
+            batch_size=1000,
+        )
     if limit:
-        ds = ds.select(range(limit))
+        ds = ds.select(range(min(limit, len(ds))))
 
     if shuffle:
         ds = ds.shuffle()
@@ -28,14 +46,8 @@ def load_scenarios(
     shuffle: bool = False,
     how_realistic_threshold: float = 0.9,
 ) -> List[Scenario]:
-    ds = download_dataset(name, split, limit, shuffle)
-    scenarios = [Scenario(**row) for row in ds]
-    scenarios = [
-        scenario
-        for scenario in scenarios
-        if scenario.how_realistic >= how_realistic_threshold
-    ]
-    return scenarios
+    ds = download_dataset(name, split, limit, shuffle, how_realistic_threshold)
+    return SCENARIOS_ADAPTER.validate_python(ds.to_list())
 
 
 if __name__ == "__main__":
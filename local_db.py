@@ -1,7 +1,21 @@
-import sqlite3
+import sqlite3 as stdlib_sqlite3
+try:
+    # pysqlite3-binary bundles a recent SQLite (newer planner and FTS5) in
+    # place of whatever the system Python links against; same API as sqlite3.
+    import pysqlite3 as sqlite3
+except ImportError:
+    import sqlite3
 import os
 import logging
 import json
+import math
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from datasets import load_dataset
 from tqdm import tqdm
 from rich import print
@@ -9,9 +23,19 @@ from rich import print
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "github_code.db")
+PARQUET_CACHE_DIR = os.path.join(BASE_DIR, ".cache", "parquet")
 
 # --- Database Schema ---
-SQL_CREATE_TABLES = """
+# STRICT tables (SQLite 3.37+) store each value with its declared type and
+# skip per-value type affinity conversion on insert. The readers (tools.py,
+# data_gen.py, ...) use the stdlib sqlite3, so its SQLite must support them too.
+TABLE_OPTIONS = (
+    " STRICT"
+    if min(sqlite3.sqlite_version_info, stdlib_sqlite3.sqlite_version_info) >= (3, 37, 0)
+    else ""
+)
+
+SQL_CREATE_TABLES = f"""
 DROP TABLE IF EXISTS github_code_fts;
 DROP TABLE IF EXISTS github_code;
 
@@ -24,30 +48,48 @@ CREATE TABLE github_code (
     language TEXT NOT NULL,
     func_code_string TEXT,
     func_code_tokens TEXT, -- JSON array stored as text
-    func_documentation_string TEXT,
+    func_documentation_string TEXT NOT NULL DEFAULT '', -- rows without docs are never loaded
     func_documentation_tokens TEXT, -- JSON array stored as text
     split_name TEXT,
-    func_code_url TEXT,
-    
-    UNIQUE(repository_name, func_path_in_repository, func_name)
+    func_code_url TEXT
+    -- (repository_name, func_path_in_repository, func_name) is unique; the
+    -- unique index is built after the bulk load, once duplicates are deleted.
+){TABLE_OPTIONS};
+"""
+
+# Keeps the first inserted row of each (repository_name, func_path_in_repository, func_name).
+SQL_DELETE_DUPLICATES = """
+DELETE FROM github_code
+WHERE id NOT IN (
+    SELECT MIN(id) FROM github_code
+    GROUP BY repository_name, func_path_in_repository, func_name
 );
 """
 
-SQL_CREATE_INDEXES_TRIGGERS = """
+SQL_CREATE_INDEXES = """
 CREATE INDEX idx_github_code_repository_name ON github_code(repository_name);
+-- Lets the repo_counts GROUP BY be answered from the index only
+CREATE INDEX idx_github_code_repo_split ON github_code(repository_name, split_name);
 CREATE INDEX idx_github_code_language ON github_code(language);
 CREATE INDEX idx_github_code_func_name ON github_code(func_name);
 CREATE INDEX idx_github_code_split_name ON github_code(split_name);
 CREATE INDEX idx_github_code_repo_lang ON github_code(repository_name, language);
-CREATE INDEX idx_github_code_repo_path_func ON github_code(repository_name, func_path_in_repository, func_name);
+CREATE UNIQUE INDEX idx_github_code_repo_path_func ON github_code(repository_name, func_path_in_repository, func_name);
+"""
 
+# The FTS triggers only keep the index in sync with later edits; the bulk load
+# runs before they exist and is indexed by a single rebuild afterwards. The
+# prefix indexes let the search's "keyword"* terms resolve from the index.
+SQL_CREATE_FTS_TRIGGERS = """
 CREATE VIRTUAL TABLE github_code_fts USING fts5(
     func_name,
     whole_func_string,
     func_documentation_string,
     repository_name,
     content='github_code',
-    content_rowid='id'
+    content_rowid='id',
+    tokenize='porter unicode61 remove_diacritics 2',
+    prefix='2 3 4 5'
 );
 
 CREATE TRIGGER github_code_ai AFTER INSERT ON github_code BEGIN
@@ -67,141 +109,479 @@ CREATE TRIGGER github_code_au AFTER UPDATE ON github_code BEGIN
         repository_name=new.repository_name
     WHERE rowid=old.id;
 END;
+"""
+
+SQL_REBUILD_FTS = """
+INSERT INTO github_code_fts (github_code_fts) VALUES ('rebuild');
+INSERT INTO github_code_fts (github_code_fts) VALUES ('optimize');
+"""
+
+# Per-repository function counts, materialized by the build after the load so
+# repo level summaries scan one row per (repository, split) instead of every
+# function. It is a snapshot: rows added to github_code later are not counted.
+SQL_REPO_COUNTS_SELECT = """
+SELECT repository_name, split_name, COUNT(*) AS function_count
+FROM github_code
+GROUP BY repository_name, split_name"""
 
-INSERT INTO github_code_fts (rowid, func_name, whole_func_string, func_documentation_string, repository_name) 
-SELECT id, func_name, whole_func_string, func_documentation_string, repository_name FROM github_code;
+SQL_CREATE_REPO_COUNTS = f"""
+DROP TABLE IF EXISTS repo_counts;
+CREATE TABLE repo_counts AS{SQL_REPO_COUNTS_SELECT};
+"""
+
+# Rows per dataset batch when bulk loading.
+INSERT_BATCH_SIZE = 10_000
+
+# Rows inserted between commits during the bulk load.
+COMMIT_EVERY_ROWS = 100_000
+
+INSERT_COLUMNS = (
+    "repository_name",
+    "func_path_in_repository",
+    "func_name",
+    "whole_func_string",
+    "language",
+    "func_code_string",
+    "func_code_tokens",
+    "func_documentation_string",
+    "func_documentation_tokens",
+    "split_name",
+    "func_code_url",
+)
+
+# Rows per compound INSERT ... VALUES (...), (...) statement. Kept under
+# SQLite's bound-parameter limit (999 before 3.32, 32766 since).
+ROWS_PER_INSERT = (
+    500 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999 // len(INSERT_COLUMNS)
+)
+
+# Nullable columns whose values are inserted unchanged, so a batch where they
+# are entirely null can omit them from the statement.
+OMITTABLE_NULL_COLUMNS = frozenset({"func_code_string", "func_code_url"})
+
+# Large text columns read from Arrow as UTF-8 bytes and bound as
+# CAST(? AS TEXT), skipping the decode to str and re-encode to UTF-8 per value.
+# A plain bytes bind would be stored as a BLOB.
+TEXT_AS_BYTES_COLUMNS = frozenset({"whole_func_string", "func_code_string"})
+
+insert_templates: dict[tuple[tuple[str, ...], int], str] = {}
+
+
+def get_insert_sql(num_rows: int, columns: tuple[str, ...] = INSERT_COLUMNS) -> str:
+    """
+    Return the INSERT statement for num_rows rows of the given columns, built
+    once per (columns, row count).
+    """
+    key = (columns, num_rows)
+    sql = insert_templates.get(key)
+    if sql is None:
+        row = "(" + ", ".join(
+            "CAST(? AS TEXT)" if name in TEXT_AS_BYTES_COLUMNS else "?" for name in columns
+        ) + ")"
+        sql = (
+            f"INSERT OR IGNORE INTO github_code ({', '.join(columns)}) VALUES "
+            + ", ".join([row] * num_rows)
+        )
+        insert_templates[key] = sql
+    return sql
+
+
+# Token arrays are stored as JSON text. Non-ASCII tokens are kept as-is rather
+# than \u-escaped so LIKE searches and json_each see the original text; the
+# default ", " separator is kept because readers split the column on whitespace.
+encode_tokens = json.JSONEncoder(ensure_ascii=False).encode
+
+# Batches fetched ahead of the SQLite writer.
+PREFETCH_BATCHES = 4
+
+# page_size only takes effect before the first table is created, and cannot
+# change once the database is in WAL mode, so it is set first.
+SQL_CREATE_DATABASE_PRAGMAS = """
+PRAGMA page_size = 32768;
+"""
+
+SQL_BULK_LOAD_PRAGMAS = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = OFF;
+PRAGMA locking_mode = EXCLUSIVE;
+PRAGMA temp_store = MEMORY;
+PRAGMA cache_size = -524288;
+PRAGMA mmap_size = 1073741824;
+"""
+
+# The finished database goes back to a rollback journal: in WAL mode even
+# read-only connections (tools.py, inspect_repos.py) need to create -shm/-wal
+# files next to it. The checkpoint folds the WAL into the database first.
+SQL_FINISH_BUILD_PRAGMAS = """
+PRAGMA wal_checkpoint(TRUNCATE);
+PRAGMA journal_mode = DELETE;
 """
 
 # --- Database Functions ---
-def create_database(db_path: str):
+def connect_for_build(db_path: str) -> sqlite3.Connection:
     """
-    Create the SQLite database with tables, indexes, and triggers.
+    Open the connection used for a whole database build.
+
+    The connection is in autocommit mode, so the driver issues no implicit
+    BEGIN/COMMIT of its own and the bulk load controls its transactions.
     """
-    logging.info(f"Creating SQLite database and tables at: {db_path}")
-    conn = sqlite3.connect(db_path)
+    return sqlite3.connect(db_path, isolation_level=None)
+
+
+def create_database(conn: sqlite3.Connection):
+    """
+    Create the SQLite database tables and apply the bulk-load pragmas on conn.
+    """
+    logging.info("Creating SQLite database and tables")
     cursor = conn.cursor()
+    cursor.executescript(SQL_CREATE_DATABASE_PRAGMAS)
+    cursor.executescript(SQL_BULK_LOAD_PRAGMAS)
     cursor.executescript(SQL_CREATE_TABLES)
-    conn.commit()
-    conn.close()
     logging.info("Database tables created successfully.")
 
 
-def create_indexes_triggers(db_path: str):
+def create_indexes_triggers(conn: sqlite3.Connection):
     """
-    Create indexes and triggers for the SQLite database.
+    Remove duplicate functions, then create indexes, triggers and the repo_counts summary for the SQLite database.
     """
-    logging.info(f"Creating indexes and triggers at: {db_path}")
-    conn = sqlite3.connect(db_path)
+    logging.info("Creating indexes and triggers")
     cursor = conn.cursor()
-    cursor.executescript(SQL_CREATE_INDEXES_TRIGGERS)
-    conn.commit()
-    conn.close()
+    cursor.execute(SQL_DELETE_DUPLICATES)
+    if cursor.rowcount > 0:
+        logging.info(f"Removed {cursor.rowcount} duplicate function records (based on repository_name, func_path_in_repository, func_name).")
+    # The FTS rebuild only reads github_code in rowid order, so it runs before
+    # the b-tree indexes are built; everything is one transaction.
+    cursor.executescript(
+        "BEGIN IMMEDIATE;"
+        + SQL_CREATE_FTS_TRIGGERS
+        + SQL_REBUILD_FTS
+        + SQL_CREATE_INDEXES
+        + SQL_CREATE_REPO_COUNTS
+        + "COMMIT;"
+    )
+    # Give the query planner statistics for the new indexes
+    cursor.execute("ANALYZE")
     logging.info("Indexes and triggers created successfully.")
 
+def repo_counts_source(conn: sqlite3.Connection) -> str:
+    """
+    Return what to select per-repository counts FROM: the repo_counts table
+    when the database has one, otherwise the same GROUP BY over github_code.
+    Readers use this instead of creating repo_counts themselves.
+
+    Args:
+        conn: Connection to the generated database
+    Returns:
+        str: A table name or parenthesized subquery with repository_name,
+        split_name and function_count columns
+    """
+    has_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'repo_counts'"
+    ).fetchone()
+    return "repo_counts" if has_table else f"({SQL_REPO_COUNTS_SELECT})"
+
 def load_hf_dataset(language: str):
     """
-    Load the CodeSearchNet dataset for the specified language from HuggingFace.
+    Load the CodeSearchNet dataset for the specified language.
+
+    Once a language has been loaded, its splits are read back from a local
+    Parquet cache, memory-mapped, without going through HuggingFace at all.
+    On the first load the splits are streamed from HuggingFace, so inserts
+    start as soon as the first shard arrives, and written to the cache as they
+    are consumed.
 
     Args:
         language (str): The programming language to load (e.g., 'python', 'javascript', etc.)
     Returns:
-        DatasetDict: The loaded CodeSearchNet dataset splits for the given language
+        dict: Split name -> pyarrow Table (cached) or iterator of Arrow batches (streamed)
     """
+    parquet_dir = os.path.join(PARQUET_CACHE_DIR, language)
+    splits_path = os.path.join(parquet_dir, "splits.json")
+    if os.path.exists(splits_path):
+        with open(splits_path) as f:
+            split_names = json.load(f)
+        logging.info(f"Loading cached CodeSearchNet dataset for {language} with splits: {split_names}")
+        return {
+            split_name: pq.read_table(
+                os.path.join(parquet_dir, f"{split_name}.parquet"), memory_map=True
+            )
+            for split_name in split_names
+        }
+
     logging.info(f"Loading CodeSearchNet dataset for language: {language}")
     dataset = load_dataset(
         "code_search_net",
         language,
-        cache_dir=os.path.join(BASE_DIR, ".cache")
+        cache_dir=os.path.join(BASE_DIR, ".cache"),
+        streaming=True,
     )
-    logging.info(f"Successfully loaded CodeSearchNet dataset for {language} with splits: {list(dataset.keys())}")
-    return dataset
+    split_names = list(dataset.keys())
+    logging.info(f"Successfully loaded CodeSearchNet dataset for {language} with splits: {split_names}")
+    os.makedirs(parquet_dir, exist_ok=True)
+    return {
+        split_name: write_through_parquet(
+            dataset[split_name].with_format("arrow").iter(batch_size=INSERT_BATCH_SIZE),
+            parquet_dir,
+            split_name,
+            split_names,
+        )
+        for split_name in split_names
+    }
 
-def insert_dataset(dataset, db_path: str):
+def write_through_parquet(batches, parquet_dir: str, split_name: str, split_names: list[str]):
     """
-    Insert all examples from a CodeSearchNet dataset (all splits) into the github_code table, with deduplication and bulk insert in a single transaction.
+    Yield Arrow batches unchanged while writing them to parquet_dir/<split_name>.parquet.
+
+    The file only gets its final name once the split is fully consumed, and
+    splits.json, which marks the cache as usable, is written once every split
+    has been.
+    """
+    path = os.path.join(parquet_dir, f"{split_name}.parquet")
+    tmp_path = path + ".tmp"
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, batch.schema, compression="zstd")
+            writer.write_table(batch)
+            yield batch
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        return
+    os.replace(tmp_path, path)
+    if all(
+        os.path.exists(os.path.join(parquet_dir, f"{name}.parquet")) for name in split_names
+    ):
+        with open(os.path.join(parquet_dir, "splits.json"), "w") as f:
+            json.dump(split_names, f)
+
+def iter_split_batches(split):
+    """
+    Iterate a split as Arrow batches of up to INSERT_BATCH_SIZE rows.
+
+    Accepts a pyarrow Table, a (streamed) HuggingFace dataset split, or an
+    iterator that already yields Arrow batches.
+    """
+    if isinstance(split, pa.Table):
+        return split.to_batches(max_chunksize=INSERT_BATCH_SIZE)
+    if hasattr(split, "with_format"):
+        return split.with_format("arrow").iter(batch_size=INSERT_BATCH_SIZE)
+    return split
+
+def prefetch(iterable, maxsize: int = PREFETCH_BATCHES):
+    """
+    Iterate over iterable on a background thread, keeping up to maxsize items ready.
+
+    Fetching and decoding dataset batches (mostly Arrow C++ code that releases
+    the GIL) then overlaps with the SQLite inserts on the calling thread.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    batches = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                batches.put(item)
+        except BaseException as e:
+            batches.put(e)
+        finally:
+            batches.put(done)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while (item := batches.get()) is not done:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Unblock the producer if the consumer stops early
+        stop.set()
+        while producer.is_alive():
+            try:
+                batches.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.1)
+
+def insert_dataset(dataset, conn: sqlite3.Connection):
+    """
+    Insert all examples from a CodeSearchNet dataset (all splits) into the github_code table, with bulk inserts committed every COMMIT_EVERY_ROWS rows.
+
+    On failure only the uncommitted rows are rolled back; rows from earlier
+    commits stay in the table, so a failed load leaves a partial database
+    (generate_database discards its build file in that case).
+
+    Duplicate functions are not filtered here; create_indexes_triggers deletes
+    them in SQL before building the unique index.
 
     Args:
-        dataset: The loaded CodeSearchNet dataset (as returned by load_code_search_net_dataset)
-        db_path: Path to the SQLite database
+        dataset: The CodeSearchNet dataset splits (as returned by load_hf_dataset)
+        conn: Connection from connect_for_build, already set up by create_database
     """
-    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    # --- Performance Pragmas ---
-    conn.execute("PRAGMA synchronous = OFF;")
-    conn.execute("PRAGMA journal_mode = MEMORY;")
-
-    insert_sql = '''
-        INSERT INTO github_code (
-            repository_name,
-            func_path_in_repository,
-            func_name,
-            whole_func_string,
-            language,
-            func_code_string,
-            func_code_tokens,
-            func_documentation_string,
-            func_documentation_tokens,
-            split_name,
-            func_code_url
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    '''
+
     record_count = 0
     skipped_count = 0
-    duplicate_count = 0
-    processed_funcs = set()  # (repository_name, func_path_in_repository, func_name)
-
-    conn.execute("BEGIN TRANSACTION;")
-    for split_name in dataset.keys():
-        for example in tqdm(dataset[split_name], desc=f"Inserting {split_name}"):
-            if 'split_name' not in example or not example['split_name']:
-                example = dict(example)
-                example['split_name'] = split_name
-            assert isinstance(example, dict)
-            func_key = (
-                example.get('repository_name', ''),
-                example.get('func_path_in_repository', ''),
-                example.get('func_name', ''),
+    rejected_count = 0
+    uncommitted_count = 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for split_name in dataset.keys():
+            split = dataset[split_name]
+            # Streamed splits have no length up front
+            total_batches = (
+                math.ceil(len(split) / INSERT_BATCH_SIZE) if hasattr(split, '__len__') else None
             )
-            if func_key in processed_funcs:
-                duplicate_count += 1
-                logging.info(f"Skipping duplicate function: {func_key}")
-                continue
-            func_docs = example.get('func_documentation_string', '')
-            if not func_docs:
-                skipped_count += 1
-                logging.debug(f"Skipping function with no documentation: {func_key}")
-                continue
-            processed_funcs.add(func_key)
-            try:
-                cursor.execute(
-                    insert_sql,
-                    (
-                        example.get('repository_name', ''),
-                        example.get('func_path_in_repository', ''),
-                        example.get('func_name', ''),
-                        example.get('whole_func_string', ''),
-                        example.get('language', ''),
-                        example.get('func_code_string', ''),
-                        json.dumps(example.get('func_code_tokens', [])),
-                        example.get('func_documentation_string', ''),
-                        json.dumps(example.get('func_documentation_tokens', [])),
-                        example.get('split_name', ''),
-                        example.get('func_code_url', ''),
+            # Iterate Arrow record batches instead of decoding one dict per row,
+            # fetched on a background thread while the previous batch is inserted
+            for table in tqdm(
+                prefetch(iter_split_batches(split)),
+                total=total_batches,
+                desc=f"Inserting {split_name}",
+                unit="batch",
+            ):
+                # Drop functions with no documentation with Arrow compute before
+                # any row is converted to Python objects
+                has_docs = pc.fill_null(
+                    pc.not_equal(table.column('func_documentation_string'), ''), False
+                )
+                documented = table.filter(has_docs)
+                skipped_count += table.num_rows - documented.num_rows
+                columns = documented.select(
+                    [name for name in documented.schema.names if name not in TEXT_AS_BYTES_COLUMNS]
+                ).to_pydict()
+                for name in TEXT_AS_BYTES_COLUMNS.intersection(documented.schema.names):
+                    columns[name] = documented.column(name).cast(pa.large_binary()).to_pylist()
+                num_rows = documented.num_rows
+                if 'split_name' in documented.schema.names:
+                    # Rows without a split name of their own take the split's,
+                    # resolved in one Arrow pass rather than per row
+                    row_split_names = documented.column('split_name')
+                    columns['split_name'] = pc.if_else(
+                        pc.fill_null(pc.equal(row_split_names, ''), True),
+                        split_name,
+                        row_split_names,
+                    ).to_pylist()
+
+                def column(name, default):
+                    return columns.get(name) or [default] * num_rows
+
+                values = {
+                    'repository_name': column('repository_name', ''),
+                    'func_path_in_repository': column('func_path_in_repository', ''),
+                    'func_name': column('func_name', ''),
+                    'whole_func_string': column('whole_func_string', ''),
+                    'language': column('language', ''),
+                    'func_code_string': column('func_code_string', ''),
+                    'func_code_tokens': list(map(encode_tokens, column('func_code_tokens', []))),
+                    'func_documentation_string': column('func_documentation_string', ''),
+                    'func_documentation_tokens': list(map(encode_tokens, column('func_documentation_tokens', []))),
+                    'split_name': column('split_name', split_name),
+                    'func_code_url': column('func_code_url', ''),
+                }
+                # Columns that are null in every row of the batch are left out
+                # of the statement and take their NULL default
+                insert_columns = tuple(
+                    name for name in INSERT_COLUMNS
+                    if not (
+                        name in OMITTABLE_NULL_COLUMNS
+                        and name in documented.schema.names
+                        and documented.column(name).null_count == num_rows
                     )
                 )
-                record_count += 1
-            except sqlite3.IntegrityError as e:
-                skipped_count += 1
-                logging.debug(f"Skipped row due to integrity error: {e}")
-                continue
-    conn.commit()
-    conn.close()
+                # Rows are flattened straight into each statement's parameters
+                # without materializing the batch as a list of tuples. One
+                # statement per ROWS_PER_INSERT rows, plus one shorter
+                # statement for the remainder.
+                rows = zip(*(values[name] for name in insert_columns))
+                for start in range(0, num_rows, ROWS_PER_INSERT):
+                    chunk_rows = min(ROWS_PER_INSERT, num_rows - start)
+                    cursor.execute(
+                        get_insert_sql(chunk_rows, insert_columns),
+                        list(chain.from_iterable(islice(rows, chunk_rows))),
+                    )
+                    # Rows violating a constraint (e.g. a null name) are
+                    # ignored rather than aborting the whole load
+                    record_count += cursor.rowcount
+                    rejected_count += chunk_rows - cursor.rowcount
+                    uncommitted_count += cursor.rowcount
+                # Commit periodically so the WAL is checkpointed and stays
+                # bounded instead of growing to the size of the whole load
+                if uncommitted_count >= COMMIT_EVERY_ROWS:
+                    conn.execute("COMMIT")
+                    conn.execute("BEGIN IMMEDIATE")
+                    uncommitted_count = 0
+        conn.execute("COMMIT")
+    except BaseException:
+        # The failure may fall between a periodic COMMIT and the next BEGIN
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
     
     logging.info(f"Successfully inserted {record_count} function records.")
     if skipped_count > 0:
-        logging.info(f"Skipped {skipped_count} records due to integrity errors.")
-    if duplicate_count > 0:
-        logging.info(f"Skipped {duplicate_count} duplicate function records (based on repository_name, func_path_in_repository, func_name).")
+        logging.info(f"Skipped {skipped_count} records with no documentation.")
+    if rejected_count > 0:
+        logging.info(f"Skipped {rejected_count} records violating table constraints.")
+
+def remove_database_files(db_path: str):
+    """
+    Delete a database file along with its WAL and shared-memory files.
+    """
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+def insert_language_shard(language: str, shard_path: str) -> str:
+    """
+    Load one language into its own shard database. Runs in a worker process.
+
+    Args:
+        language: The programming language to load from CodeSearchNet
+        shard_path: Path of the shard database to create
+    Returns:
+        str: shard_path, once the shard is fully written
+    """
+    remove_database_files(shard_path)
+    conn = connect_for_build(shard_path)
+    try:
+        create_database(conn)
+        dataset = load_hf_dataset(language)
+        logging.info(f"Inserting CodeSearchNet dataset for language: {language}")
+        insert_dataset(dataset, conn)
+        logging.info(f"Finished inserting CodeSearchNet dataset for language: {language}")
+    finally:
+        conn.close()
+    return shard_path
+
+def merge_shards(conn: sqlite3.Connection, shard_paths: list[str]):
+    """
+    Copy the rows of each shard database into the database of conn, in order, then delete the shards.
+
+    Args:
+        conn: Connection from connect_for_build
+        shard_paths: Shard databases written by insert_language_shard
+    """
+    columns = ", ".join(INSERT_COLUMNS)
+    for shard_path in shard_paths:
+        # ATTACH is not allowed inside a transaction, so each shard is copied
+        # in its own
+        conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            f"INSERT INTO main.github_code ({columns}) "
+            f"SELECT {columns} FROM shard.github_code ORDER BY id"
+        )
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE shard")
+        remove_database_files(shard_path)
 
 def generate_database(languages: list[str], overwrite: bool = False, db_path: str = DB_PATH):
     """
@@ -209,7 +589,7 @@ def generate_database(languages: list[str], overwrite: bool = False, db_path: st
 
     Args:
         language: The programming language to load from CodeSearchNet (default: 'python').
-        overwrite: If True, any existing database file at db_path will be removed.
+        overwrite: If True, any existing database file at db_path is replaced once the new one is built.
         db_path: The path where the SQLite database file should be created.
     """
     logging.info(
@@ -222,27 +602,64 @@ def generate_database(languages: list[str], overwrite: bool = False, db_path: st
         logging.info(f"Creating data directory: {db_dir}")
         os.makedirs(db_dir)
 
-    if overwrite and os.path.exists(db_path):
-        logging.warning(f"Removing existing database file: {db_path}")
-        os.remove(db_path)
-    elif not overwrite and os.path.exists(db_path):
+    if not overwrite and os.path.exists(db_path):
         logging.warning(
             f"Database file {db_path} exists and overwrite is False. Assuming file is already generated."
         )
         return
 
-    # 1. Create database schema (Tables only)
-    create_database(db_path)
+    # The database is built under a temporary name and only moved to db_path
+    # once complete, so an interrupted build never leaves a partial database
+    # that a later run would take as generated.
+    build_path = f"{db_path}.building"
+    remove_database_files(build_path)
 
-    # 2. Populate database
-    for language in languages:
-        dataset = load_hf_dataset(language)
-        logging.info(f"Inserting CodeSearchNet dataset for language: {language}")
-        insert_dataset(dataset, db_path)
-        logging.info(f"Finished inserting CodeSearchNet dataset for language: {language}")
+    # With several languages each one is loaded into its own shard database
+    # in a separate process, so SQLite's single writer is not a bottleneck,
+    # and the shards are merged afterwards.
+    shard_paths = (
+        [f"{db_path}.{language}.shard" for language in languages] if len(languages) > 1 else []
+    )
+    try:
+        if shard_paths:
+            with ProcessPoolExecutor(max_workers=min(len(languages), os.cpu_count() or 1)) as executor:
+                list(executor.map(insert_language_shard, languages, shard_paths))
+
+        # One connection is kept for the whole build, so its page cache and
+        # memory map carry over from the load into index creation. It is only
+        # opened once the shard workers are done, so none of them inherits it.
+        conn = connect_for_build(build_path)
+        try:
+            # 1. Create database schema (Tables only)
+            create_database(conn)
+
+            # 2. Populate database
+            if shard_paths:
+                logging.info(f"Merging {len(shard_paths)} language shards into {build_path}")
+                merge_shards(conn, shard_paths)
+            else:
+                dataset = load_hf_dataset(languages[0])
+                logging.info(f"Inserting CodeSearchNet dataset for language: {languages[0]}")
+                insert_dataset(dataset, conn)
+                logging.info(f"Finished inserting CodeSearchNet dataset for language: {languages[0]}")
+
+            # 3. Create Indexes and Triggers
+            create_indexes_triggers(conn)
+            conn.execute("PRAGMA optimize")
+            conn.executescript(SQL_FINISH_BUILD_PRAGMAS)
+        finally:
+            conn.close()
 
-    # 3. Create Indexes and Triggers
-    create_indexes_triggers(db_path)
+        if os.path.exists(db_path):
+            logging.warning(f"Replacing existing database file: {db_path}")
+        # Stale -wal/-shm files must not be paired with the new database
+        remove_database_files(db_path)
+        os.replace(build_path, db_path)
+    finally:
+        # Shards and the partial database left behind by a failed build
+        for shard_path in shard_paths:
+            remove_database_files(shard_path)
+        remove_database_files(build_path)
 
     logging.info(f"Database generation process completed for {db_path}.")
 
@@ -259,7 +676,6 @@ def get_first_n_from_repo(repo_name: str, n: int = 3, db_path: str = DB_PATH):
         list: List of dictionaries containing the entries, or empty list if no entries found
     """
     conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row  # This allows us to access columns by name
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -269,15 +685,11 @@ def get_first_n_from_repo(repo_name: str, n: int = 3, db_path: str = DB_PATH):
     """, (repo_name, n))
     
     results = cursor.fetchall()
+    # Column names are read once from the cursor instead of per row
+    columns = [description[0] for description in cursor.description]
     conn.close()
     
-    ret = []
-    if results:
-        for row in results:
-            # Convert sqlite3.Row to dict
-            ret.append(dict(row))
-            
-    return ret
+    return [dict(zip(columns, row)) for row in results]
 
 if __name__ == "__main__":
     # generate_database(languages=["python", "go"], overwrite=False)
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import tools
+from local_db import connect_for_build, create_database, create_indexes_triggers
+
+
+def insert_functions(conn, repository_name: str, count: int, keyword: str, padding: str = ""):
+    conn.executemany(
+        """
+        INSERT INTO github_code (
+            repository_name, func_path_in_repository, func_name,
+            whole_func_string, language, func_code_tokens, func_documentation_string
+        ) VALUES (?, ?, ?, ?, 'python', '[]', ?)
+        """,
+        [
+            (
+                repository_name,
+                f"src/module_{i}.py",
+                f"{keyword}_{i}",
+                f"def {keyword}_{i}(): return {keyword}(){padding}",
+                f"{keyword} helper {i}",
+            )
+            for i in range(count)
+        ],
+    )
+
+
+class SearchRepoTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "github_code.db")
+        conn = connect_for_build(self.db_path)
+        create_database(conn)
+        # The sibling repository's name tokenizes to a superset of google/jax,
+        # and it has far more matching rows, all ranked above the rows of the
+        # repository searched.
+        insert_functions(conn, "google/jax-md", 400, "parse")
+        insert_functions(conn, "google/jax", 5, "parse", padding=" pass" * 50)
+        create_indexes_triggers(conn)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+        patcher = mock.patch.object(tools, "DB_PATH", self.db_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.close_thread_conn)
+
+    def close_thread_conn(self):
+        conn = getattr(tools.thread_local, "conn", None)
+        if conn is not None:
+            conn.close()
+        tools.thread_local.__dict__.clear()
+        self.tmpdir.cleanup()
+
+    def test_fts_ignores_prefix_sibling_repository(self):
+        results = tools._search_with_fts(tools.get_cursor(), "google/jax", ["parse"], 20)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(r.repo_name == "google/jax" for r in results))
+
+    def test_search_repo_finds_rows_next_to_prefix_sibling(self):
+        results = tools.search_repo("google/jax", ["parse", "zzz"])
+        self.assertIsNotNone(results)
+        self.assertEqual(len(results), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
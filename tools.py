@@ -1,24 +1,113 @@
 from dataclasses import dataclass
 import sqlite3
 import logging
+import threading
 from typing import Optional, List, Tuple
 from local_db import DB_PATH
 from data_types import Function
 from rich import print
 
-conn = None
+# One read-only connection per thread: tool calls run in worker threads, and
+# separate connections let their queries proceed in parallel instead of
+# queueing on one connection's mutex.
+thread_local = threading.local()
+
+# Read-side settings for the long-lived search connections: memory-mapped
+# pages, a larger page cache and in-memory temp b-trees. The mapping is shared
+# OS page cache, so it can cover the whole index; cache_size is private to
+# each thread's connection and stays moderate.
+SQL_READER_PRAGMAS = """
+PRAGMA query_only = 1;
+PRAGMA mmap_size = 1073741824;
+PRAGMA cache_size = -65536;
+PRAGMA temp_store = MEMORY;
+"""
+
+# The search SQL is module constants plus one LIKE shape per keyword count, so
+# every statement a connection runs stays prepared in its statement cache.
+SQL_STATEMENT_CACHE_SIZE = 256
 
 
 def get_conn():
-    global conn
+    conn = getattr(thread_local, "conn", None)
     if conn is None:
         conn = sqlite3.connect(
-            f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False
+            f"file:{DB_PATH}?mode=ro", uri=True, cached_statements=SQL_STATEMENT_CACHE_SIZE
         )
+        conn.executescript(SQL_READER_PRAGMAS)
+        thread_local.conn = conn
     return conn
 
 
-@dataclass
+def get_cursor():
+    """Return this thread's cursor on its search connection, reused across calls."""
+    cursor = getattr(thread_local, "cursor", None)
+    if cursor is None:
+        cursor = get_conn().cursor()
+        thread_local.cursor = cursor
+    return cursor
+
+
+# Search results carry a preview of the docstring, cut in SQL so long
+# docstrings are never copied out of SQLite; read_repo_function returns it whole.
+MAX_SEARCH_DOCS_CHARS = 200
+SQL_FUNC_DOCS_PREVIEW = f"""
+        CASE WHEN length(gc.func_documentation_string) > {MAX_SEARCH_DOCS_CHARS}
+            THEN substr(gc.func_documentation_string, 1, {MAX_SEARCH_DOCS_CHARS - 3}) || '...'
+            ELSE gc.func_documentation_string
+        END as func_docs"""
+
+# The snippet is the first SNIPPET_TOKENS code tokens. Only a bounded prefix
+# of func_code_tokens is read out of SQLite to build it; one extra character
+# tells whether the prefix was cut.
+SNIPPET_TOKENS = 50
+SNIPPET_SOURCE_CHARS = 4000
+SQL_FUNC_SNIPPET_SOURCE = f"""
+        substr(COALESCE(gc.func_code_tokens, ''), 1, {SNIPPET_SOURCE_CHARS + 1}) as func_code_tokens"""
+
+
+# bm25 column weights, in github_code_fts column order: func_name,
+# whole_func_string, func_documentation_string, repository_name. The
+# repository name only filters, so it does not count towards relevance.
+FTS_BM25_WEIGHTS = "5.0, 1.0, 3.0, 0.0"
+FTS_KEYWORD_COLUMNS = "func_name whole_func_string func_documentation_string"
+MIN_FTS_KEYWORD_LENGTH = 2
+
+# Base query using FTS for keyword search, best matches first. The MATCH runs
+# in a CTE so the planner always drives it from the FTS index, and the exact
+# repository restriction is applied there too, before the LIMIT, so rows of
+# repositories whose tokenized name matches the phrase (google/jax vs
+# google/jax-md) can't crowd the top hits out. Only those hits are joined
+# back. Each FTS rowid maps to one github_code row, so no DISTINCT is needed.
+# Kept as one constant string so SQLite's statement cache reuses the prepared
+# statement.
+SQL_SEARCH_FTS = f"""
+    WITH fts_hits AS (
+        SELECT rowid, bm25(github_code_fts, {FTS_BM25_WEIGHTS}) AS score
+        FROM github_code_fts
+        WHERE github_code_fts MATCH ?
+          AND rowid IN (SELECT id FROM github_code WHERE repository_name = ?)
+        ORDER BY score
+        LIMIT ?
+    )
+    SELECT
+        gc.repository_name, 
+        gc.func_path_in_repository, 
+        gc.func_name,{SQL_FUNC_DOCS_PREVIEW},{SQL_FUNC_SNIPPET_SOURCE}
+    FROM fts_hits h
+    JOIN github_code gc ON gc.id = h.rowid
+    ORDER BY h.score
+    """
+
+SQL_READ_FUNCTION = """
+        SELECT repository_name, func_path_in_repository, func_name, whole_func_string, 
+               language, func_documentation_string, func_code_tokens
+        FROM github_code
+        WHERE repository_name = ? AND func_path_in_repository = ? AND func_name = ?
+        """
+
+
+@dataclass(slots=True, frozen=True)
 class SearchResult:
     repo_name: str
     func_path: str
@@ -41,42 +130,15 @@ def search_repo(
     Returns:
         List of SearchResult objects containing matching functions, or None if no results found
     """
-    conn = get_conn()
-    cursor = conn.cursor()
+    cursor = get_cursor()
 
     try:
-        # Collect all search results from different methods
-        all_results = []
-
-        # Try FTS with original keywords
-        fts_results = _search_with_fts(cursor, repo_name, keywords, max_results)
-        all_results.extend(fts_results)
-
-        # Try enhanced search with camelCase variations
-        for keyword in keywords:
-            enhanced_keywords = _generate_camelcase_variations([keyword])
-            for enhanced_keyword in enhanced_keywords:
-                enhanced_results = _search_with_fts(
-                    cursor, repo_name, [enhanced_keyword], max_results
-                )
-                all_results.extend(enhanced_results)
-
-        # Try LIKE fallback for substring matching
-        like_results = _search_with_like(cursor, repo_name, keywords, max_results)
-        all_results.extend(like_results)
-
-        # Remove duplicates while preserving order
-        seen = set()
-        search_results = []
-        for result in all_results:
-            # Create a unique key for each result
-            key = (result.repo_name, result.func_path, result.func_name)
-            if key not in seen:
-                seen.add(key)
-                search_results.append(result)
-
-        # Limit to max_results
-        search_results = search_results[:max_results]
+        # A single FTS query covers the keywords and their prefixes; the LIKE
+        # scan only runs when the index has nothing, for substrings FTS can't
+        # match (e.g. a keyword in the middle of an identifier).
+        search_results = _search_with_fts(cursor, repo_name, keywords, max_results)
+        if not search_results:
+            search_results = _search_with_like(cursor, repo_name, keywords, max_results)
 
         if not search_results:
             logging.info(
@@ -97,76 +159,58 @@ def search_repo(
         return []
 
 
-def _generate_camelcase_variations(keywords: List[str]) -> List[str]:
-    """Generate camelCase variations of keywords to improve search matching."""
-    variations = []
-    for keyword in keywords:
-        # Original keyword
-        variations.append(keyword)
-        # Capitalized version
-        variations.append(keyword.capitalize())
-        # Common camelCase prefixes
-        variations.append(f"Combine{keyword.capitalize()}")
-        variations.append(f"Mix{keyword.capitalize()}")
-        variations.append(f"Base{keyword.capitalize()}")
-        # Prefix search for FTS (only wildcards at the end work in FTS5)
-        variations.append(f"{keyword}*")
-        variations.append(f"{keyword.capitalize()}*")
-    return list(set(variations))  # Remove duplicates
-
-
 def _search_with_fts(
     cursor, repo_name: str, keywords: List[str], max_results: int
 ) -> List[SearchResult]:
     """Search using FTS5 full-text search."""
-    # Build FTS query from keywords, escaping special characters
-    escaped_keywords = []
-    for keyword in keywords:
-        # Escape FTS5 special characters by wrapping in double quotes
-        if any(
-            char in keyword for char in ["-", " ", '"', "'", "*", ".", ":", "(", ")", "+"]
-        ):
-            # Escape any existing quotes and wrap in quotes
-            escaped_keyword = '"' + keyword.replace('"', '""') + '"'
-        else:
-            escaped_keyword = keyword
-        escaped_keywords.append(escaped_keyword)
-
-    fts_query = " AND ".join(escaped_keywords) if escaped_keywords else "*"
-
-    # Base query using FTS for keyword search
-    query = """
-    SELECT DISTINCT 
-        gc.repository_name, 
-        gc.func_path_in_repository, 
-        gc.func_name,
-        COALESCE(gc.func_documentation_string, '') as func_docs,
-        COALESCE(gc.func_code_tokens, '') as func_code_tokens
-    FROM github_code gc
-    JOIN github_code_fts fts ON gc.id = fts.rowid
-    WHERE github_code_fts MATCH ?
-    AND gc.repository_name = ?
-    LIMIT ?
-    """
+    # Quote each keyword (doubling inner quotes) so FTS5 syntax characters are
+    # matched literally, and make it a prefix term; any keyword may match and
+    # rows matching more of them rank first. Single characters are dropped:
+    # as prefixes they match most of the index and have no prefix index.
+    escaped_keywords = [
+        '"' + keyword.replace('"', '""') + '"*'
+        for keyword in keywords
+        if len(keyword.strip()) >= MIN_FTS_KEYWORD_LENGTH
+    ]
+    if not escaped_keywords:
+        return []
 
+    # Keywords only match the function's own columns, so a keyword that
+    # happens to appear in the repository name doesn't match every row.
+    fts_query = f"{{{FTS_KEYWORD_COLUMNS}}} : ({' OR '.join(escaped_keywords)})"
+    if repo_name.strip():
+        # Narrow the match to the repository inside the FTS index itself; the
+        # phrase match on the tokenized name is not exact, so the query also
+        # restricts rowids to the repository's rows.
+        repo_phrase = '"' + repo_name.replace('"', '""') + '"'
+        fts_query = f"repository_name : {repo_phrase} AND {fts_query}"
+
+    query = SQL_SEARCH_FTS
     params = [fts_query, repo_name, max_results]
 
     logging.info(f"FTS search: repo_name={repo_name}, keywords={keywords}")
-    logging.debug(f"FTS query: {query}")
-    logging.debug(f"FTS parameters: {params}")
+    # Debug lines use deferred %-formatting: the query text and parameters are
+    # only formatted when debug logging is actually enabled.
+    logging.debug("FTS query: %s", query)
+    logging.debug("FTS parameters: %s", params)
 
     try:
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+        # Rows are converted straight off the cursor; LIMIT bounds how many.
+        results = _convert_to_search_results(cursor.execute(query, params))
 
         logging.info(f"FTS search returned {len(results)} results")
 
-        return _convert_to_search_results(results)
+        return results
     except sqlite3.OperationalError as e:
         logging.warning(f"FTS search failed for keywords {keywords}: {e}")
         return []
 
 
+# The LIKE query has one condition group per keyword; capping the count bounds
+# the number of distinct statements the fallback can prepare.
+MAX_LIKE_KEYWORDS = 8
+
+
 def _search_with_like(
     cursor, repo_name: str, keywords: List[str], max_results: int
 ) -> List[SearchResult]:
@@ -174,11 +218,14 @@ def _search_with_like(
     if not keywords:
         return []
 
-    # Build LIKE conditions for substring matching
+    # Build LIKE conditions for substring matching. The leading % is kept on
+    # purpose: prefixes are already answered by the FTS prefix terms, and this
+    # fallback exists for infix matches. The scan stays bounded to the one
+    # repository's rows through idx_github_code_repository_name.
     like_conditions = []
     params = []
 
-    for keyword in keywords:
+    for keyword in keywords[:MAX_LIKE_KEYWORDS]:
         like_conditions.append(
             """
             (gc.func_name LIKE ? OR 
@@ -193,12 +240,10 @@ def _search_with_like(
     where_clause = " AND ".join(like_conditions)
 
     query = f"""
-    SELECT DISTINCT 
+    SELECT
         gc.repository_name, 
         gc.func_path_in_repository, 
-        gc.func_name,
-        COALESCE(gc.func_documentation_string, '') as func_docs,
-        COALESCE(gc.func_code_tokens, '') as func_code_tokens
+        gc.func_name,{SQL_FUNC_DOCS_PREVIEW},{SQL_FUNC_SNIPPET_SOURCE}
     FROM github_code gc
     WHERE {where_clause}
     AND gc.repository_name = ?
@@ -208,15 +253,14 @@ def _search_with_like(
     params.extend([repo_name, max_results])
 
     logging.info(f"LIKE search: repo_name={repo_name}, keywords={keywords}")
-    logging.debug(f"LIKE query: {query}")
-    logging.debug(f"LIKE parameters: {params}")
+    logging.debug("LIKE query: %s", query)
+    logging.debug("LIKE parameters: %s", params)
 
-    cursor.execute(query, params)
-    results = cursor.fetchall()
+    results = _convert_to_search_results(cursor.execute(query, params))
 
     logging.info(f"LIKE search returned {len(results)} results")
 
-    return _convert_to_search_results(results)
+    return results
 
 
 def _convert_to_search_results(results) -> List[SearchResult]:
@@ -226,9 +270,10 @@ def _convert_to_search_results(results) -> List[SearchResult]:
         repo_name_result, func_path, func_name, func_docs, func_code_tokens = row
 
         # Truncate func_code_tokens to reasonable length
-        tokens = func_code_tokens.split() if func_code_tokens else []
-        func_snippet = " ".join(tokens[:50])
-        if len(tokens) > 50:
+        truncated = len(func_code_tokens) > SNIPPET_SOURCE_CHARS
+        tokens = func_code_tokens[:SNIPPET_SOURCE_CHARS].split(maxsplit=SNIPPET_TOKENS)
+        func_snippet = " ".join(tokens[:SNIPPET_TOKENS])
+        if truncated or len(tokens) > SNIPPET_TOKENS:
             func_snippet += "..."
 
         search_results.append(
@@ -258,22 +303,18 @@ def read_repo_function(
     Returns:
         Function object if found, None if not found
     """
-    conn = get_conn()
-    cursor = conn.cursor()
+    cursor = get_cursor()
 
     try:
-        query = """
-        SELECT repository_name, func_path_in_repository, func_name, whole_func_string, 
-               language, func_documentation_string, func_code_tokens
-        FROM github_code
-        WHERE repository_name = ? AND func_path_in_repository = ? AND func_name = ?
-        """
+        query = SQL_READ_FUNCTION
 
         logging.info(
             f"Reading function: repo_name={repo_name}, func_path={func_path}, func_name={func_name}"
         )
-        logging.debug(f"SQL query: {query}")
-        logging.debug(f"SQL parameters: [{repo_name}, {func_path}, {func_name}]")
+        logging.debug("SQL query: %s", query)
+        logging.debug(
+            "SQL parameters: [%s, %s, %s]", repo_name, func_path, func_name
+        )
 
         cursor.execute(query, [repo_name, func_path, func_name])
         result: Optional[Tuple] = cursor.fetchone()
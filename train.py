@@ -3,10 +3,12 @@ import wandb
 import weave
 from agent import run_agent_and_score
 from load_data import load_scenarios
-from local_db import generate_database
+from llm_client import close_shared_client
+from local_db import DB_PATH, generate_database
 from art.local import LocalBackend
 from art.utils import iterate_dataset
 import dotenv
+import os
 
 
 ROLLOUTS_PER_GROUP = 4
@@ -19,9 +21,10 @@ dotenv.load_dotenv()
 weave.init("side-project/rl-run-00")
 
 
-async def train(model):
-    # Generate database
-    generate_database(languages=["python", "go"], overwrite=True)
+async def train(model, force_rebuild: bool = False):
+    # Generate database; an existing one is reused unless a rebuild is forced
+    if force_rebuild or not os.path.exists(DB_PATH):
+        generate_database(languages=["python", "go"], overwrite=True)
 
     # Get training scenarios
     training_data = load_scenarios(
@@ -72,6 +75,8 @@ async def train(model):
         )
         await model.train(finished_groups)
 
+    await close_shared_client()
+
 
 if __name__ == "__main__":
     import asyncio
@@ -79,6 +84,11 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", type=str, required=True)
+    parser.add_argument(
+        "--force-rebuild",
+        action="store_true",
+        help="Rebuild the code database even if it already exists",
+    )
     args = parser.parse_args()
 
     model_name = args.model
@@ -91,5 +101,5 @@ if __name__ == "__main__":
         },
     )
 
-    asyncio.run(train(model_name))
+    asyncio.run(train(model_name, force_rebuild=args.force_rebuild))
     wandb.finish()
@@ -5,8 +5,13 @@ import os
 dotenv.load_dotenv()
 
 api = HfApi(token=os.getenv("HF_TOKEN"))
-api.upload_folder(
+# Uploads files from several workers and commits them in chunks; the upload
+# resumes where it stopped if interrupted. The local judge/agent caches in
+# data/ are not part of the dataset.
+api.upload_large_folder(
     folder_path="./data/",
     repo_id="JamesSED/synthetic_QA_code_search_net",
     repo_type="dataset",
-)
\ No newline at end of file
+    ignore_patterns=["*.db", "*.db-journal", "*.db-wal", "*.db-shm"],
+    num_workers=8,
+)